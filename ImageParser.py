@@ -1,74 +1,38 @@
 import asyncio
 import csv
 import logging
+import multiprocessing
 import os
+import queue
 import random
-import re
-from typing import Tuple
-
-from camoufox import AsyncCamoufox
-from playwright.async_api import Page
+import shutil
+import time
 
+import browser_worker
 import config
+import extraction
+import postprocess
 import utils
+from linkstore import LinkStore
+from snapshot_cache import SnapshotCache
 from configure_logger import configure
 
 logger = logging.getLogger(__name__)
 configure(logger)
 
 
-async def goto_next_page(page: Page) -> Tuple[bool, bool]:
-    max_retries = 7
-    next_page_clicked = False
-    is_complete = False
-    selector = "xpath=//div[@id='pagination-element']/nav/span[last()]/button"
-
-    for retry in range(max_retries):
-        try:
-            await asyncio.sleep(config.LONG_DELAY)
-            next_page = await page.query_selector(selector)
-
-            if next_page:
-                if await next_page.is_disabled():
-                    is_complete = True
-                    break
-                is_attached = await next_page.evaluate("el => el.isConnected")
-                if not is_attached:
-                    logger.warning(f"Элемент кнопки не прикреплен к DOM, повторная попытка {retry + 1}")
-                    continue
-
-                next_page_locator = page.locator(selector)
-
-                await next_page_locator.click()
-
-                next_page_clicked = True
-                break
-            else:
-                logger.warning("Кнопка следующей страницы не найдена")
-                is_complete = True  # Если кнопки нет, считаем, что это конец
-                break
-
-        except Exception as e:
-            logger.warning(
-                f"Ошибка при попытке перейти на следующую страницу (попытка {retry + 1}): {e}")
-            if retry < max_retries - 1:
-                await asyncio.sleep(2)
-                continue
-            else:
-                logger.error("Не удалось перейти на следующую страницу после всех попыток")
-                break
-
-    return is_complete, next_page_clicked
-
-
 class ImageParser:
-    def __init__(self, archive_folder, batches_folder, log_callback=None):
+    def __init__(self, archive_folder, batches_folder, log_callback=None, use_snapshot_cache=False):
         self.archive_folder = archive_folder
         self.batches_folder = batches_folder
         self.archive_names_file = "archive_name.csv"
         self.archive_links_file = "archive_links.csv"
-        self.processed_links = set()
+        self.archive_links_db = "archive_links.db"
+        self.processed_links = None
         self.existing_descriptions = set()
+        self.snapshots_folder = os.path.join(archive_folder, "snapshots")
+        self.use_snapshot_cache = use_snapshot_cache
+        self.snapshot_cache = None
         self.log_callback = log_callback
         self.is_running = False
 
@@ -85,17 +49,28 @@ class ImageParser:
 
     def load_processed_links(self):
         links_file = os.path.join(self.archive_folder, self.archive_links_file)
-        self.processed_links.clear()
-        if os.path.exists(links_file):
-            try:
+        if self.processed_links is not None:
+            self.processed_links.close()
+        self.processed_links = LinkStore(os.path.join(self.archive_folder, self.archive_links_db))
+        if self.processed_links.is_current():
+            return
+
+        # База пустая или собрана по старым правилам канонизации - пересобираем из CSV-архива ссылок
+        try:
+            if os.path.exists(links_file):
                 with open(links_file, 'r', encoding='utf-8', newline='') as f:
                     reader = csv.reader(f)
                     next(reader, None)
-                    for row in reader:
-                        if row:
-                            self.processed_links.add(row[0])
-            except Exception as e:
-                self.log(f"Ошибка загрузки архива ссылок: {e}")
+                    self.processed_links.rebuild(row[0] for row in reader if row)
+                self.log("База обработанных ссылок пересобрана из архива ссылок.")
+            else:
+                self.processed_links.rebuild([])
+        except Exception as e:
+            # Без актуальной базы все уже обработанные поиски были бы пройдены заново
+            self.log(f"Ошибка загрузки архива ссылок: {e}", "error")
+            self.processed_links.close()
+            self.processed_links = None
+            raise
 
     def load_existing_descriptions(self):
         names_file = os.path.join(self.archive_folder, self.archive_names_file)
@@ -113,11 +88,31 @@ class ImageParser:
             except Exception as e:
                 self.log(f"Ошибка загрузки архива описаний: {e}", "error")
 
+    def open_snapshot_cache(self):
+        if self.snapshot_cache is None:
+            self.snapshot_cache = SnapshotCache(self.snapshots_folder, config.SNAPSHOT_CACHE_MAX_MB * 1024 * 1024)
+        return self.snapshot_cache
+
+    def add_description(self, names_writer, names_file, current_id, name):
+        if name in self.existing_descriptions:
+            return False
+        names_writer.writerow([current_id, name])
+        names_file.flush()
+
+        self.existing_descriptions.add(name)
+        self.log(f"[{current_id}] {name}")
+        return True
+
     def filter_new_links(self, links):
         new_links = []
+        seen = set()
         for link in links:
             stripped_link = link.strip()
-            if stripped_link and utils.is_valid_url(stripped_link) and stripped_link not in self.processed_links:
+            if not stripped_link or not utils.is_valid_url(stripped_link):
+                continue
+            canonical_link = utils.canonicalize_url(stripped_link)
+            if canonical_link not in seen and stripped_link not in self.processed_links:
+                seen.add(canonical_link)
                 new_links.append(stripped_link)
         return new_links
 
@@ -154,118 +149,189 @@ class ImageParser:
         if not self.is_running:
             return
         parsed_count = 0
+        passed_pages = 0
+        current_page = utils.get_search_page(url)
+        failures = 0
+        is_complete = False
 
-        async with AsyncCamoufox(**config.BROWSER_OPTIONS) as browser_instance:
-            page = await browser_instance.new_page()
-            try:
-                names_file_path = os.path.join(self.archive_folder, self.archive_names_file)
-                file_exists = os.path.exists(names_file_path)
-
-                with open(names_file_path, 'a', encoding='utf-8', newline='') as names_file:
-                    names_writer = csv.writer(names_file, quoting=csv.QUOTE_ALL)
-                    if not file_exists or os.path.getsize(names_file_path) == 0:
-                        names_writer.writerow(['ID', 'Prompt'])
-
-                    current_id = self.get_next_id()
-                    await page.goto(url)
-
-                    await asyncio.sleep(config.LONG_DELAY)
-
-                    need_wait_selector = False
-
-                    passed_pages = 0
-                    while self.is_running and (depth == 0 or passed_pages < depth):
-                        try:
-                            await asyncio.sleep(3)
-
-                            if need_wait_selector:
-                                await asyncio.sleep(config.LONG_DELAY)
-
-                            self.log(f"Обработка страницы #{passed_pages + 1}")
-
-                            images = await page.query_selector_all("xpath=//div[@id='search-results']/div/div/a")
-                            if not images:
-                                self.log("На странице не найдено изображений.")
+        try:
+            names_file_path = os.path.join(self.archive_folder, self.archive_names_file)
+            file_exists = os.path.exists(names_file_path)
+
+            with open(names_file_path, 'a', encoding='utf-8', newline='') as names_file:
+                names_writer = csv.writer(names_file, quoting=csv.QUOTE_ALL)
+                if not file_exists or os.path.getsize(names_file_path) == 0:
+                    names_writer.writerow(['ID', 'Prompt'])
+
+                current_id = self.get_next_id()
+
+                while self.is_running and not is_complete and (depth == 0 or passed_pages < depth):
+                    max_pages = config.WORKER_MAX_PAGES
+                    if depth > 0:
+                        max_pages = min(max_pages, depth - passed_pages)
+
+                    self.log(f"Запуск процесса браузера со страницы #{current_page}")
+                    context = multiprocessing.get_context("spawn")
+                    messages = context.Queue()
+                    stop_event = context.Event()
+                    worker = context.Process(target=browser_worker.run_worker,
+                                             args=(url, current_page, max_pages, messages, stop_event),
+                                             daemon=True)
+                    worker.start()
+
+                    result = None
+                    browser_processes = set()
+                    last_heartbeat = last_progress = time.monotonic()
+                    try:
+                        while self.is_running:
+                            try:
+                                message = await asyncio.to_thread(messages.get, True, 1)
+                            except queue.Empty:
+                                message = None
+
+                            now = time.monotonic()
+                            if message is None:
+                                if not worker.is_alive():
+                                    self.log(f"Процесс браузера завершился с кодом {worker.exitcode}", "warning")
+                                    break
+                                if now - last_heartbeat > config.WORKER_HEARTBEAT_TIMEOUT:
+                                    self.log("Процесс браузера не отвечает, перезапуск.", "warning")
+                                    break
+                                if now - last_progress > config.WORKER_STALL_TIMEOUT:
+                                    self.log(f"Страница #{current_page} не обработана за отведённое время, перезапуск.",
+                                             "warning")
+                                    break
                                 continue
 
-                            for image in images:
-                                if not self.is_running:
-                                    break
-                                try:
-                                    image_href = await image.get_attribute("href")
-                                    image_name_elem = await image.query_selector("xpath=/meta[@itemprop='name']")
-                                    duration = await image.query_selector("xpath=/meta[@itemprop='duration']")
-                                    if image_name_elem and image_href and not duration and not "/3d-assets/" in image_href and not "/templates/" in image_href:
-                                        image_href += "?prev_url=detail"
-                                        image_name_content = await image_name_elem.get_attribute("content")
-                                        if image_name_content:
-                                            name = image_name_content.replace('\n', ' ').strip()
-                                            name = re.sub(r'\s+', ' ', name).strip()
-
-                                            if name and name not in self.existing_descriptions:
-                                                names_writer.writerow([current_id, name])
-                                                names_file.flush()
-
-                                                self.existing_descriptions.add(name)
-                                                self.log(f"[{current_id}] {name}")
-
-                                                parsed_count += 1
-                                                current_id += 1
-                                            else:
-                                                pass
-                                except Exception as e:
-                                    self.log(f"Ошибка при обработке изображения: {e}")
-
-                            passed_pages += 1
-
-                            if 0 < depth <= passed_pages:
-                                self.log(f"Достигнута заданная глубина обработки: {depth} страниц.")
+                            kind = message[0]
+                            if kind == "log":
+                                self.log(message[1], message[2])
+                            elif kind in ("heartbeat", "page"):
+                                last_heartbeat = now
+                                browser_processes.update(message[-2])
+                                if kind == "page":
+                                    page_number, tiles = message[1], message[2]
+                                    if self.use_snapshot_cache:
+                                        try:
+                                            await asyncio.to_thread(self.open_snapshot_cache().put, url, page_number,
+                                                                    tiles)
+                                        except Exception as e:
+                                            self.log(f"Ошибка сохранения страницы в кэш: {e}", "warning")
+
+                                    for tile in tiles:
+                                        name = extraction.extract_name(tile)
+                                        if name and self.add_description(names_writer, names_file, current_id, name):
+                                            parsed_count += 1
+                                            current_id += 1
+
+                                    last_progress = now
+                                    passed_pages += 1
+                                    current_page = page_number + 1
+                                    failures = 0
+                                rss_mb = message[-1] / (1024 * 1024)
+                                if rss_mb > config.WORKER_MAX_RSS_MB and not stop_event.is_set():
+                                    self.log(f"Процесс браузера занимает {rss_mb:.0f} МБ, перезапуск после "
+                                             f"текущей страницы.", "warning")
+                                    stop_event.set()
+                            elif kind == "done":
+                                result = message[1]
                                 break
+                    finally:
+                        if result is not None:
+                            await asyncio.to_thread(worker.join, config.WORKER_SHUTDOWN_TIMEOUT)
+                        if worker.is_alive():
+                            await asyncio.to_thread(browser_worker.kill_process_tree, worker.pid)
+                        # После аварийного завершения процесса его браузер остаётся без родителя
+                        await asyncio.to_thread(browser_worker.kill_processes, browser_processes)
+                        messages.close()
+
+                    if result == "complete":
+                        is_complete = True
+                    elif result in (None, "failed") and self.is_running:
+                        failures += 1
+                        if failures > config.WORKER_MAX_RESTARTS:
+                            self.log(f"Процесс браузера перезапускался {config.WORKER_MAX_RESTARTS} раз подряд "
+                                     f"без результата, ссылка пропущена: {url}", "error")
+                            return
+
+                if 0 < depth <= passed_pages:
+                    self.log(f"Достигнута заданная глубина обработки: {depth} страниц.")
+
+            if self.is_running:
+                self.save_link_to_archive(url)
+            self.log(f"Завершена обработка ссылки. Всего получено картинок: {parsed_count}")
 
-                            is_complete, next_page_clicked = await goto_next_page(page)
-                            need_wait_selector = True
+        except Exception as e:
+            self.log(f"Критическая ошибка при парсинге {url}: {e}")
 
-                            if is_complete:
-                                logger.info("Достигнута последняя доступная страница")
-                                break
+    async def process_links(self, links, depth=100):
+        self.ensure_folders()
+        try:
+            self.load_processed_links()
+            self.load_existing_descriptions()
 
-                            if not next_page_clicked:
-                                logger.warning("Не удалось найти или нажать кнопку следующей страницы")
-                                break
+            new_links = self.filter_new_links(links)
 
-                        except Exception:
-                            continue
+            if not new_links:
+                self.log("Все ссылки уже были обработаны ранее.")
+                return
 
-                self.save_link_to_archive(url)
-                self.log(f"Завершена обработка ссылки. Всего получено картинок: {parsed_count}")
+            self.log(f"К обработке: {len(new_links)} новых ссылок.")
+            self.is_running = True
+            for i, link in enumerate(new_links):
+                if not self.is_running:
+                    break
+                self.log(f"Обрабатываю ссылку {i + 1} из {len(new_links)}: {link}")
+                await self.parse_single_url(link, depth)
 
-            except Exception as e:
-                self.log(f"Критическая ошибка при парсинге {url}: {e}")
-            finally:
-                await browser_instance.close()
+            if self.is_running:
+                self.log("Обработка всех ссылок завершена.")
+            self.is_running = False
+        finally:
+            self.close()
 
-    async def process_links(self, links, depth=100):
+    def replay_snapshots(self):
         self.ensure_folders()
-        self.load_processed_links()
         self.load_existing_descriptions()
+        if not os.path.exists(self.snapshots_folder):
+            self.log("Кэш страниц не найден.")
+            return 0
 
-        new_links = self.filter_new_links(links)
-
-        if not new_links:
-            self.log("Все ссылки уже были обработаны ранее.")
-            return
+        parsed_count = 0
+        pages_count = 0
+        try:
+            cache = self.open_snapshot_cache()
+            names_file_path = os.path.join(self.archive_folder, self.archive_names_file)
+            file_exists = os.path.exists(names_file_path)
+
+            with open(names_file_path, 'a', encoding='utf-8', newline='') as names_file:
+                names_writer = csv.writer(names_file, quoting=csv.QUOTE_ALL)
+                if not file_exists or os.path.getsize(names_file_path) == 0:
+                    names_writer.writerow(['ID', 'Prompt'])
+
+                current_id = self.get_next_id()
+                for url, page_number, tiles in cache.iter_pages():
+                    pages_count += 1
+                    for tile in tiles:
+                        name = extraction.extract_name(tile)
+                        if name and self.add_description(names_writer, names_file, current_id, name):
+                            parsed_count += 1
+                            current_id += 1
+        except Exception as e:
+            self.log(f"Ошибка повторной обработки кэша: {e}", "error")
+        finally:
+            self.close()
 
-        self.log(f"К обработке: {len(new_links)} новых ссылок.")
-        self.is_running = True
-        for i, link in enumerate(new_links):
-            if not self.is_running:
-                break
-            self.log(f"Обрабатываю ссылку {i + 1} из {len(new_links)}: {link}")
-            await self.parse_single_url(link, depth)
+        self.log(f"Повторная обработка кэша завершена: страниц {pages_count}, новых описаний {parsed_count}.")
+        return parsed_count
 
-        if self.is_running:
-            self.log("Обработка всех ссылок завершена.")
-        self.is_running = False
+    def close(self):
+        if self.processed_links is not None:
+            self.processed_links.close()
+            self.processed_links = None
+        if self.snapshot_cache is not None:
+            self.snapshot_cache.close()
+            self.snapshot_cache = None
 
     def stop_processing(self):
         self.is_running = False
@@ -328,3 +394,36 @@ class ImageParser:
                 self.log(f"Ошибка при обновлении файла архива: {e}")
 
         return batches_created
+
+    def postprocess_archive(self):
+        names_file = os.path.join(self.archive_folder, self.archive_names_file)
+        if not os.path.exists(names_file):
+            self.log("Архив описаний не найден.")
+            return None
+
+        temp_file = names_file + ".tmp"
+        backup_file = names_file + ".bak"
+        report_file = os.path.join(self.archive_folder, "postprocess_report.csv")
+        try:
+            stats = postprocess.process_archive(
+                names_file, temp_file, report_file,
+                chain=config.POSTPROCESS_CHAIN,
+                chunk_size=config.POSTPROCESS_CHUNK_SIZE,
+                workers=config.POSTPROCESS_WORKERS
+            )
+            shutil.copy2(names_file, backup_file)
+            os.replace(temp_file, names_file)
+        except Exception as e:
+            self.log(f"Ошибка постобработки архива: {e}", "error")
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            return None
+
+        self.log(f"Постобработка завершена: обработано {stats.get('total', 0)}, "
+                 f"оставлено {stats.get('kept', 0)} записей.")
+        for name, count in stats.items():
+            if name not in ("total", "kept"):
+                self.log(f"Шаг '{name}' отбросил {count} записей.")
+        self.log(f"Отчёт об отброшенных записях: {report_file}")
+        self.log(f"Копия исходного архива: {backup_file}")
+        return stats
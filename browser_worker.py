@@ -0,0 +1,224 @@
+import asyncio
+import logging
+from typing import Iterable, List, Tuple
+
+import psutil
+from camoufox import AsyncCamoufox
+from playwright.async_api import Page
+
+import config
+import utils
+
+logger = logging.getLogger(__name__)
+
+
+class QueueLogHandler(logging.Handler):
+    def __init__(self, queue):
+        super().__init__()
+        self.queue = queue
+
+    def emit(self, record):
+        self.queue.put(("log", record.getMessage(), record.levelname.lower()))
+
+
+def process_tree_rss(pid=None) -> int:
+    try:
+        process = psutil.Process(pid)
+        rss = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return rss
+    except psutil.Error:
+        return 0
+
+
+def child_processes(pid=None) -> List[Tuple[int, float]]:
+    # PID вместе со временем запуска, чтобы не убить чужой процесс с переиспользованным PID
+    children = []
+    try:
+        for child in psutil.Process(pid).children(recursive=True):
+            try:
+                children.append((child.pid, child.create_time()))
+            except psutil.Error:
+                continue
+    except psutil.Error:
+        pass
+    return children
+
+
+def kill_processes(children: Iterable[Tuple[int, float]]):
+    processes = []
+    for pid, create_time in children:
+        try:
+            process = psutil.Process(pid)
+            if process.create_time() == create_time:
+                processes.append(process)
+        except psutil.Error:
+            continue
+    for p in processes:
+        try:
+            p.kill()
+        except psutil.Error:
+            continue
+    psutil.wait_procs(processes, timeout=10)
+
+
+def kill_process_tree(pid):
+    try:
+        process = psutil.Process(pid)
+    except psutil.Error:
+        return
+    processes = process.children(recursive=True) + [process]
+    for p in processes:
+        try:
+            p.kill()
+        except psutil.Error:
+            continue
+    psutil.wait_procs(processes, timeout=10)
+
+
+async def goto_next_page(page: Page) -> Tuple[bool, bool]:
+    max_retries = 7
+    next_page_clicked = False
+    is_complete = False
+    selector = "xpath=//div[@id='pagination-element']/nav/span[last()]/button"
+
+    for retry in range(max_retries):
+        try:
+            await asyncio.sleep(config.LONG_DELAY)
+            next_page = await page.query_selector(selector)
+
+            if next_page:
+                if await next_page.is_disabled():
+                    is_complete = True
+                    break
+                is_attached = await next_page.evaluate("el => el.isConnected")
+                if not is_attached:
+                    logger.warning(f"Элемент кнопки не прикреплен к DOM, повторная попытка {retry + 1}")
+                    continue
+
+                next_page_locator = page.locator(selector)
+
+                await next_page_locator.click()
+
+                next_page_clicked = True
+                break
+            else:
+                logger.warning("Кнопка следующей страницы не найдена")
+                is_complete = True  # Если кнопки нет, считаем, что это конец
+                break
+
+        except Exception as e:
+            logger.warning(
+                f"Ошибка при попытке перейти на следующую страницу (попытка {retry + 1}): {e}")
+            if retry < max_retries - 1:
+                await asyncio.sleep(2)
+                continue
+            else:
+                logger.error("Не удалось перейти на следующую страницу после всех попыток")
+                break
+
+    return is_complete, next_page_clicked
+
+
+async def heartbeat(queue):
+    while True:
+        queue.put(("heartbeat", child_processes(), process_tree_rss()))
+        await asyncio.sleep(config.WORKER_HEARTBEAT_INTERVAL)
+
+
+async def crawl(url, start_page, max_pages, queue, stop_event):
+    heartbeat_task = asyncio.create_task(heartbeat(queue))
+    try:
+        async with AsyncCamoufox(**config.BROWSER_OPTIONS) as browser_instance:
+            queue.put(("heartbeat", child_processes(), process_tree_rss()))
+            page = await browser_instance.new_page()
+            try:
+                await page.goto(utils.set_search_page(url, start_page))
+
+                await asyncio.sleep(config.LONG_DELAY)
+
+                need_wait_selector = False
+                empty_polls = 0
+
+                current_page = start_page
+                passed_pages = 0
+                while not stop_event.is_set() and passed_pages < max_pages:
+                    try:
+                        await asyncio.sleep(3)
+
+                        if need_wait_selector:
+                            await asyncio.sleep(config.LONG_DELAY)
+
+                        logger.info(f"Обработка страницы #{current_page}")
+
+                        images = await page.query_selector_all("xpath=//div[@id='search-results']/div/div/a")
+                        if not images:
+                            logger.info("На странице не найдено изображений.")
+                            empty_polls += 1
+                            if empty_polls >= config.WORKER_MAX_EMPTY_POLLS:
+                                queue.put(("done", "complete"))
+                                return
+                            continue
+                        empty_polls = 0
+
+                        tiles = []
+                        for image in images:
+                            try:
+                                duration = await image.query_selector("xpath=/meta[@itemprop='duration']")
+                                image_name_elem = await image.query_selector("xpath=/meta[@itemprop='name']")
+                                tiles.append({
+                                    "href": await image.get_attribute("href"),
+                                    "name": await image_name_elem.get_attribute("content") if image_name_elem else None,
+                                    "duration": duration is not None,
+                                })
+                            except Exception as e:
+                                logger.info(f"Ошибка при обработке изображения: {e}")
+
+                        passed_pages += 1
+                        queue.put(("page", current_page, tiles, child_processes(), process_tree_rss()))
+                        current_page += 1
+
+                        if passed_pages >= max_pages:
+                            queue.put(("done", "budget"))
+                            return
+
+                        if stop_event.is_set():
+                            break
+
+                        is_complete, next_page_clicked = await goto_next_page(page)
+                        need_wait_selector = True
+
+                        if is_complete:
+                            logger.info("Достигнута последняя доступная страница")
+                            queue.put(("done", "complete"))
+                            return
+
+                        if not next_page_clicked:
+                            logger.warning("Не удалось найти или нажать кнопку следующей страницы")
+                            queue.put(("done", "failed"))
+                            return
+
+                    except Exception:
+                        continue
+
+                queue.put(("done", "stopped"))
+            finally:
+                await browser_instance.close()
+    finally:
+        heartbeat_task.cancel()
+
+
+def run_worker(url, start_page, max_pages, queue, stop_event):
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.handlers.clear()
+    logger.addHandler(QueueLogHandler(queue))
+    try:
+        asyncio.run(crawl(url, start_page, max_pages, queue, stop_event))
+    except Exception as e:
+        logger.error(f"Критическая ошибка в процессе браузера: {e}")
+        raise
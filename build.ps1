@@ -56,6 +56,11 @@ $addData = @(
     "('ImageParser.py', '.'),",
     "('config.py', '.'),",
     "('utils.py', '.'),",
+    "('postprocess.py', '.'),",
+    "('linkstore.py', '.'),",
+    "('browser_worker.py', '.'),",
+    "('extraction.py', '.'),",
+    "('snapshot_cache.py', '.'),",
     "('configure_logger.py', '.'),"
 )
 
@@ -70,6 +75,7 @@ $hiddenImports = @(
     "'browserforge',",
     "'language_tags',",
     "'playwright',",
+    "'psutil',",
     "'patchright'"
 )
 
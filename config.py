@@ -11,4 +11,31 @@ BROWSER_OPTIONS = {
     "screen": Screen(max_width=1280, max_height=720),
     "humanize": True,
     "locale": "en-US"
-}
\ No newline at end of file
+}
+
+WORKER_MAX_PAGES = 20  # Перезапуск браузера каждые N страниц
+WORKER_MAX_RSS_MB = 2048  # Перезапуск браузера при превышении памяти
+WORKER_HEARTBEAT_INTERVAL = 10
+WORKER_HEARTBEAT_TIMEOUT = 90
+WORKER_STALL_TIMEOUT = 600  # Максимальное время обработки одной страницы
+WORKER_SHUTDOWN_TIMEOUT = 30
+WORKER_MAX_RESTARTS = 5
+WORKER_MAX_EMPTY_POLLS = 5  # Сколько раз проверять пустую выдачу, прежде чем считать поиск завершённым
+
+SNAPSHOT_CACHE_ENABLED = False  # Сохранять плитки результатов поиска для повторной обработки без браузера
+SNAPSHOT_CACHE_MAX_MB = 1024
+
+POSTPROCESS_CHUNK_SIZE = 5000
+POSTPROCESS_WORKERS = None  # None - по числу ядер
+
+POSTPROCESS_CHAIN = [
+    ("normalize_unicode", {"form": "NFKC"}),
+    ("collapse_whitespace", {}),
+    ("strip_boilerplate", {"patterns": [
+        # Шаблон срабатывает только после разделителя и удаляется вместе с ним
+        r"\s*[-–—|,]\s*(royalty[- ]free\s+)?stock\s+(photo|image|picture|illustration|vector|video|footage)s?\.?\s*$",
+        r"\s*[-–—|,]\s*royalty[- ]free\.?\s*$",
+    ]}),
+    ("length", {"min_length": 10, "max_length": 1000}),
+    ("banned_words", {"words": []}),
+]
@@ -1,4 +1,5 @@
 import logging
+import multiprocessing
 import os
 from datetime import datetime
 
@@ -6,6 +7,10 @@ from colorlog import ColoredFormatter
 
 
 def configure(logger: logging.Logger):
+    # Дочерние процессы (spawn) повторно импортируют модули родителя - лог-файл создаёт только главный процесс
+    if multiprocessing.parent_process() is not None:
+        return
+
     logger.setLevel(logging.INFO)
     logger.propagate = False
     logger.handlers.clear()
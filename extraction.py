@@ -0,0 +1,16 @@
+import re
+from typing import Optional
+
+EXCLUDED_PATHS = ("/3d-assets/", "/templates/")
+
+
+def extract_name(tile: dict) -> Optional[str]:
+    href = tile.get("href")
+    name = tile.get("name")
+    if not href or not name or tile.get("duration"):
+        return None
+    if any(path in href for path in EXCLUDED_PATHS):
+        return None
+    name = name.replace('\n', ' ').strip()
+    name = re.sub(r'\s+', ' ', name).strip()
+    return name or None
@@ -0,0 +1,47 @@
+import hashlib
+import sqlite3
+
+import utils
+
+
+def _link_key(link: str) -> int:
+    # 8 байт хэша канонической ссылки, чтобы база оставалась компактной
+    digest = hashlib.blake2b(utils.canonicalize_url(link).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+class LinkStore:
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS links (key INTEGER PRIMARY KEY)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+
+    def __contains__(self, link):
+        cursor = self.connection.execute("SELECT 1 FROM links WHERE key = ?", (_link_key(link),))
+        return cursor.fetchone() is not None
+
+    def is_current(self):
+        # Ключи считаются по канонической форме ссылки, поэтому при смене правил их нужно пересобрать
+        row = self.connection.execute("SELECT value FROM meta WHERE name = 'canonical_version'").fetchone()
+        return row is not None and row[0] == str(utils.CANONICAL_VERSION)
+
+    def add(self, link):
+        self.connection.execute("INSERT OR IGNORE INTO links (key) VALUES (?)", (_link_key(link),))
+
+    def rebuild(self, links):
+        self.connection.execute("BEGIN")
+        try:
+            self.connection.execute("DELETE FROM links")
+            self.connection.executemany("INSERT OR IGNORE INTO links (key) VALUES (?)",
+                                        ((_link_key(link),) for link in links))
+            self.connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('canonical_version', ?)",
+                                    (str(utils.CANONICAL_VERSION),))
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        self.connection.execute("COMMIT")
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,163 @@
+import csv
+import multiprocessing
+import os
+import re
+import unicodedata
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Шаг цепочки: имя зарегистрированного шага и его параметры
+Step = Tuple[str, dict]
+Row = List[str]
+
+
+def normalize_unicode(text: str, form: str = "NFKC") -> Optional[str]:
+    return unicodedata.normalize(form, text)
+
+
+def collapse_whitespace(text: str) -> Optional[str]:
+    text = text.replace('\n', ' ').strip()
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+# Описания, которые шаблоны strip_boilerplate должны оставлять без изменений
+PRESERVED_EXAMPLES = (
+    "Cute cat sleeping on sofa.",
+    "Watercolor illustration",
+    "Red apple isolated on white background",
+    "Livestock photo of cows in field",
+    "Photographer shooting a stock photo",
+    "Trader watching live stock video",
+    "Woman reviewing stock images",
+)
+
+
+def strip_boilerplate(text: str, patterns: Sequence[str] = ()) -> Optional[str]:
+    for pattern in patterns:
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE)
+    return text.strip()
+
+
+def length_filter(text: str, min_length: int = 0, max_length: int = 0) -> Optional[str]:
+    if len(text) < min_length:
+        return None
+    if max_length and len(text) > max_length:
+        return None
+    return text
+
+
+def banned_words_filter(text: str, words: Sequence[str] = ()) -> Optional[str]:
+    if not words:
+        return text
+    pattern = r'\b(?:' + '|'.join(re.escape(word) for word in words) + r')\b'
+    if re.search(pattern, text, flags=re.IGNORECASE):
+        return None
+    return text
+
+
+# Нормализаторы возвращают изменённый текст, фильтры - None, если строку нужно отбросить
+STEPS = {
+    "normalize_unicode": normalize_unicode,
+    "collapse_whitespace": collapse_whitespace,
+    "strip_boilerplate": strip_boilerplate,
+    "length": length_filter,
+    "banned_words": banned_words_filter,
+}
+
+
+def validate_chain(chain: Iterable[Step]):
+    for name, params in chain:
+        if name not in STEPS:
+            raise ValueError(f"Неизвестный шаг постобработки: {name}")
+        if name == "strip_boilerplate":
+            for example in PRESERVED_EXAMPLES:
+                if strip_boilerplate(example, **params) != example:
+                    raise ValueError(f"Шаблоны strip_boilerplate удаляют содержательный текст: '{example}'")
+
+
+def apply_chain(text: str, chain: Sequence[Step]) -> Tuple[Optional[str], Optional[str]]:
+    for name, params in chain:
+        text = STEPS[name](text, **params)
+        if not text:
+            return None, name
+    return text, None
+
+
+def _process_chunk(chain: Sequence[Step], rows: List[Row]) -> Tuple[List[Row], List[Tuple[Row, str]]]:
+    kept = []
+    dropped = []
+    for row in rows:
+        text, dropped_by = apply_chain(row[1], chain)
+        if text is None:
+            dropped.append((row, dropped_by))
+        else:
+            kept.append([row[0], text] + row[2:])
+    return kept, dropped
+
+
+def _read_chunks(reader: Iterator[Row], chunk_size: int) -> Iterator[List[Row]]:
+    rows = (row for row in reader if row and len(row) > 1)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def process_archive(input_path: str, output_path: str, report_path: str, chain: Sequence[Step],
+                    chunk_size: int = 5000, workers: Optional[int] = None) -> Dict[str, int]:
+    # Файл читается и пишется порциями, в работе одновременно не более workers * 2 порций
+    validate_chain(chain)
+    chain = [(name, dict(params)) for name, params in chain]
+    workers = workers or os.cpu_count() or 1
+    stats = Counter()
+    seen = set()
+
+    with open(input_path, 'r', encoding='utf-8', newline='') as src, \
+            open(output_path, 'w', encoding='utf-8', newline='') as dst, \
+            open(report_path, 'w', encoding='utf-8', newline='') as report, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        reader = csv.reader(src)
+        writer = csv.writer(dst, quoting=csv.QUOTE_ALL)
+        report_writer = csv.writer(report, quoting=csv.QUOTE_ALL)
+
+        header = next(reader, None) or ['ID', 'Prompt']
+        writer.writerow(header)
+        report_writer.writerow(['ID', 'Prompt', 'Filter'])
+
+        worker = partial(_process_chunk, chain)
+        chunks = _read_chunks(reader, chunk_size)
+        pending = deque()
+
+        def submit_next():
+            chunk = next(chunks, None)
+            if chunk is not None:
+                pending.append(executor.submit(worker, chunk))
+
+        for _ in range(workers * 2):
+            submit_next()
+
+        while pending:
+            kept, dropped = pending.popleft().result()
+            submit_next()
+
+            for row, dropped_by in dropped:
+                report_writer.writerow([row[0], row[1], dropped_by])
+                stats[dropped_by] += 1
+                stats["total"] += 1
+
+            for row in kept:
+                stats["total"] += 1
+                # Нормализация может сделать разные описания одинаковыми
+                if row[1] in seen:
+                    report_writer.writerow([row[0], row[1], "duplicate"])
+                    stats["duplicate"] += 1
+                    continue
+                seen.add(row[1])
+                writer.writerow(row)
+                stats["kept"] += 1
+
+    return dict(stats)
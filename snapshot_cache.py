@@ -0,0 +1,94 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Iterator, List, Tuple
+
+import utils
+
+
+class SnapshotCache:
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        os.makedirs(folder, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(folder, "index.db"), isolation_level=None,
+                                          check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS blobs (digest TEXT PRIMARY KEY, size INTEGER, last_used REAL)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS pages (url TEXT, page INTEGER, digest TEXT, PRIMARY KEY (url, page))")
+
+    def _blob_path(self, digest):
+        return os.path.join(self.folder, digest[:2], digest + ".json.gz")
+
+    def put(self, url, page, tiles: List[dict]) -> str:
+        payload = json.dumps(tiles, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(payload).hexdigest()
+        blob_path = self._blob_path(digest)
+
+        # Одинаковые страницы хранятся один раз
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            temp_path = blob_path + ".tmp"
+            with gzip.open(temp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(temp_path, blob_path)
+
+        self.connection.execute(
+            "INSERT INTO blobs (digest, size, last_used) VALUES (?, ?, ?) "
+            "ON CONFLICT(digest) DO UPDATE SET last_used = excluded.last_used",
+            (digest, os.path.getsize(blob_path), time.time()))
+        self.connection.execute("INSERT OR REPLACE INTO pages (url, page, digest) VALUES (?, ?, ?)",
+                                (utils.canonicalize_url(url), page, digest))
+        self.evict()
+        return digest
+
+    def get(self, digest) -> List[dict]:
+        with gzip.open(self._blob_path(digest), 'rb') as f:
+            tiles = json.loads(f.read().decode('utf-8'))
+        self.connection.execute("UPDATE blobs SET last_used = ? WHERE digest = ?", (time.time(), digest))
+        return tiles
+
+    def total_size(self) -> int:
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def evict(self):
+        # Сначала удаляются давно не использованные страницы: last_used обновляется при записи и чтении
+        total = self.total_size()
+        while total > self.max_bytes:
+            row = self.connection.execute(
+                "SELECT digest, size FROM blobs ORDER BY last_used LIMIT 1").fetchone()
+            if row is None:
+                break
+            digest, size = row
+            blob_path = self._blob_path(digest)
+            try:
+                os.remove(blob_path)
+            except FileNotFoundError:
+                pass
+            try:
+                os.rmdir(os.path.dirname(blob_path))
+            except OSError:
+                pass  # В папке остались другие страницы
+            self.connection.execute("DELETE FROM pages WHERE digest = ?", (digest,))
+            self.connection.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+            total -= size
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def iter_pages(self) -> Iterator[Tuple[str, int, List[dict]]]:
+        rows = self.connection.execute("SELECT url, page, digest FROM pages ORDER BY url, page").fetchall()
+        for url, page, digest in rows:
+            try:
+                tiles = self.get(digest)
+            except (OSError, ValueError):
+                continue
+            yield url, page, tiles
+
+    def close(self):
+        self.connection.close()
@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import multiprocessing
 import os
 from datetime import datetime
 
@@ -112,7 +113,8 @@ async def main(page: ft.Page):
         parser = ImageParser(
             archive_folder=archive_path.value,
             batches_folder=batches_path.value,
-            log_callback=add_log
+            log_callback=add_log,
+            use_snapshot_cache=snapshot_cache_cb.value
         )
 
         set_controls_enabled(False)
@@ -178,6 +180,36 @@ async def main(page: ft.Page):
         else:
             add_log("Не удалось создать партии. Проверьте лог на наличие ошибок.", "error")
 
+    async def postprocess_click(e):
+        temp_parser = ImageParser(
+            archive_folder=archive_path.value,
+            batches_folder=batches_path.value,
+            log_callback=add_log
+        )
+        set_controls_enabled(False)
+        start_btn.disabled = True
+        add_log("Начинаю постобработку архива...", "info")
+        try:
+            await asyncio.to_thread(temp_parser.postprocess_archive)
+        finally:
+            start_btn.disabled = False
+            set_controls_enabled(True)
+
+    async def replay_click(e):
+        temp_parser = ImageParser(
+            archive_folder=archive_path.value,
+            batches_folder=batches_path.value,
+            log_callback=add_log
+        )
+        set_controls_enabled(False)
+        start_btn.disabled = True
+        add_log("Начинаю повторную обработку кэша страниц...", "info")
+        try:
+            await asyncio.to_thread(temp_parser.replay_snapshots)
+        finally:
+            start_btn.disabled = False
+            set_controls_enabled(True)
+
     links_input = ft.TextField(label="Ссылки (по одной на строку)", multiline=True, min_lines=4, max_lines=6,
                                border_color=config.BORDER_COLOR)
     depth_input = ft.TextField(label="Глубина (страниц)", value="100", width=150, keyboard_type=ft.KeyboardType.NUMBER,
@@ -191,6 +223,7 @@ async def main(page: ft.Page):
                                      keyboard_type=ft.KeyboardType.NUMBER, border_color=config.BORDER_COLOR)
     batch_size_input = ft.TextField(label="Строк в партии", value="1000", width=200,
                                     keyboard_type=ft.KeyboardType.NUMBER, border_color=config.BORDER_COLOR)
+    snapshot_cache_cb = ft.Checkbox(label="Сохранять страницы в кэш", value=config.SNAPSHOT_CACHE_ENABLED)
     remove_from_archive_cb = ft.Checkbox(label="Удалять строки из архива", value=False)
     batches_path = ft.TextField(label="Папка для сохранения партий", value=os.path.abspath("./batches/"), expand=True,
                                 read_only=True,
@@ -235,15 +268,38 @@ async def main(page: ft.Page):
                                                padding=ft.padding.all(15)
                                            ))
 
+    replay_btn = ft.ElevatedButton("Из кэша",
+                                   on_click=replay_click,
+                                   width=150,
+                                   icon=ft.Icons.REPLAY,
+                                   bgcolor=ft.Colors.PRIMARY,
+                                   color=ft.Colors.BLACK,
+                                   style=ft.ButtonStyle(
+                                       shape=ft.RoundedRectangleBorder(radius=10),
+                                       padding=ft.padding.all(15)
+                                   ))
+    postprocess_btn = ft.ElevatedButton("Постобработка",
+                                        on_click=postprocess_click,
+                                        icon=ft.Icons.CLEANING_SERVICES,
+                                        bgcolor=ft.Colors.PRIMARY,
+                                        color=ft.Colors.BLACK,
+                                        style=ft.ButtonStyle(
+                                            shape=ft.RoundedRectangleBorder(radius=10),
+                                            padding=ft.padding.all(15)
+                                        ))
+
     interactive_controls.extend([
         links_input,
         depth_input,
+        snapshot_cache_cb,
         archive_browse_btn,
+        replay_btn,
         num_batches_input,
         batch_size_input,
         remove_from_archive_cb,
         batches_browse_btn,
-        create_batches_btn
+        create_batches_btn,
+        postprocess_btn
     ])
 
     tabs = ft.Tabs(
@@ -261,7 +317,7 @@ async def main(page: ft.Page):
                                 content=ft.Column([
                                     ft.Text("1. Введите ссылки и глубину обработки", weight=ft.FontWeight.BOLD),
                                     links_input,
-                                    depth_input,
+                                    ft.Row([depth_input, snapshot_cache_cb], spacing=7),
                                 ]),
                                 padding=15,
                             )
@@ -275,7 +331,7 @@ async def main(page: ft.Page):
                                 padding=7
                             )
                         ),
-                        ft.Row([start_btn, stop_btn], alignment=ft.MainAxisAlignment.CENTER, spacing=7)
+                        ft.Row([start_btn, stop_btn, replay_btn], alignment=ft.MainAxisAlignment.CENTER, spacing=7)
                     ],
                     spacing=7
                 )
@@ -305,7 +361,7 @@ async def main(page: ft.Page):
                                 padding=15
                             )
                         ),
-                        ft.Row([create_batches_btn], alignment=ft.MainAxisAlignment.CENTER)
+                        ft.Row([create_batches_btn, postprocess_btn], spacing=7, alignment=ft.MainAxisAlignment.CENTER)
                     ],
                     spacing=7
                 )
@@ -334,4 +390,5 @@ async def main(page: ft.Page):
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     ft.app(target=main)
@@ -1,4 +1,15 @@
-from urllib.parse import urlparse
+import re
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+# Параметры, которые не влияют на выдачу поиска
+VOLATILE_PARAMS = {
+    "prev_url", "search_type", "get_facets", "load_type", "is_recent_search",
+    "ref", "gclid", "fbclid", "msclkid",
+}
+VOLATILE_PREFIXES = ("utm_",)
+
+# Увеличивать при любом изменении правил canonicalize_url: сохранённые ключи ссылок будут пересобраны
+CANONICAL_VERSION = 3
 
 
 def is_valid_url(url: str) -> bool:
@@ -6,4 +17,52 @@ def is_valid_url(url: str) -> bool:
         result = urlparse(url)
         return all([result.scheme, result.netloc])
     except:
-        return False
\ No newline at end of file
+        return False
+
+
+def _is_volatile(key: str) -> bool:
+    return key in VOLATILE_PARAMS or key.startswith(VOLATILE_PREFIXES)
+
+
+def canonicalize_url(url: str) -> str:
+    parsed = urlparse(url.strip())
+    netloc = parsed.netloc.lower()
+    if netloc.startswith("www."):
+        netloc = netloc[4:]
+    path = parsed.path.rstrip('/') or '/'
+
+    params = []
+    for key, value in parse_qsl(parsed.query, keep_blank_values=True):
+        key = key.strip().lower()
+        value = value.strip()
+        if not value or _is_volatile(key):
+            continue
+        if key == "search_page" and value == "1":
+            continue
+        if key == "k":
+            value = re.sub(r'\s+', ' ', value).lower()
+        elif key.startswith("filters["):
+            # filters[content_type:photo] и filters[content_type: photo] - один и тот же фильтр
+            key = re.sub(r'\s+', '', key)
+            value = value.lower()
+        params.append((key, value))
+
+    query = urlencode(sorted(params))
+    return urlunparse((parsed.scheme.lower(), netloc, path, '', query, ''))
+
+
+def get_search_page(url: str) -> int:
+    for key, value in parse_qsl(urlparse(url).query):
+        if key == "search_page":
+            try:
+                return max(int(value), 1)
+            except ValueError:
+                break
+    return 1
+
+
+def set_search_page(url: str, page: int) -> str:
+    parsed = urlparse(url)
+    params = [(key, value) for key, value in parse_qsl(parsed.query, keep_blank_values=True) if key != "search_page"]
+    params.append(("search_page", str(page)))
+    return urlunparse(parsed._replace(query=urlencode(params)))